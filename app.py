@@ -4,22 +4,53 @@ Pro-User Datenspeicherung: Jeder User hat eigene Tree/Veranstaltungen.
 """
 import os
 import re
-import json
+import csv
+import hmac
+import hashlib
+import sqlite3
+import tempfile
 import threading
+import unicodedata
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from io import BytesIO
-
-from flask import Flask, request, jsonify, send_file
+from io import StringIO
+from operator import attrgetter, itemgetter
+from urllib.parse import quote
+
+import orjson
+from flask import Flask, Response, g, request, jsonify, send_file
+from flask.json.provider import DefaultJSONProvider
+from flask_compress import Compress
 from flask_cors import CORS
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+import xlsxwriter
 
 from scraper import (
     QISScraper, tree_to_dict, dict_to_tree
 )
 
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON-Provider auf Basis von orjson – serialisiert direkt zu Bytes."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+app.config["COMPRESS_ALGORITHM"] = ["br", "gzip"]
+app.config["COMPRESS_MIN_SIZE"] = 1024
 CORS(app)
+Compress(app)
 
 # User-Verwaltung: "user1:pass1,user2:pass2"
 USERS_STR = os.environ.get("USERS", "loni:kurskompass2026")
@@ -31,19 +62,69 @@ for pair in USERS_STR.split(","):
         USERS[u.strip()] = p.strip()
 
 API_KEY = os.environ.get("API_KEY", "loni-kurskompass-2026-secret")
+# Endpoints ohne API-Key
+PUBLIC_ENDPOINTS = {"health", "ping", "api_login", "static"}
 
-# Pro-User Caches: { "loni": {"tree": [...], "veranstaltungen": [...]} }
+# Pro-User Caches: { "loni": UserCache(...) }
 user_caches = {}
-cached_lehramtstypen = None
+cached_lehramtstypen = None  # bereits serialisierte JSON-Bytes
+lehramtstypen_lock = threading.Lock()
 scraper_lock = threading.Lock()
-DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+# Hintergrund-Jobs (Scan/Scrape); begrenzt die Zahl gleichzeitiger Threads
+JOB_EXECUTOR = ThreadPoolExecutor(max_workers=2)
+SCAN_WORKERS = 4  # max. parallel gescannte Studiengänge bei root_paths
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
 os.makedirs(DATA_DIR, exist_ok=True)
+# Persistenz: eine Zeile pro (user, kind) mit fertig serialisiertem JSON + ETag
+DB_PATH = os.path.join(DATA_DIR, "kurskompass.db")
+
+# Excel-Formate (xlsxwriter), pro Workbook einmal per add_format() angelegt
+HEADER_FORMAT = {
+    "bold": True, "font_color": "#FFFFFF", "font_size": 11, "bg_color": "#D4467E",
+    "align": "center", "valign": "vcenter", "text_wrap": True, "border": 1,
+}
+BODY_FORMAT = {"valign": "vcenter", "text_wrap": True, "border": 1}
+
+# Flask-Compress hängt das Verfahren ans ETag an ("abc" -> "abc:br")
+COMPRESSED_ETAG_RE = re.compile(r':(?:br|gzip)"')
+
+EXPORT_HEADERS = (
+    "Titel", "Bereich", "Modul", "Art", "Gruppe", "Dozent",
+    "Tag", "Zeit", "Rhythmus", "Gebäude", "Raum", "SWS",
+    "Max. TN", "Belegung", "Semester", "Studiengänge"
+)
+EXPORT_WIDTHS = (40, 30, 12, 20, 12, 25, 6, 16, 8, 25, 30, 5, 8, 12, 12, 40)
+# Veranstaltung-Felder der Export-Spalten; "Gebäude" wird vor "raum" aus dem Raum abgeleitet
+EXPORT_FIELDS = (
+    "titel", "pfad", "kennung", "veranstaltungsart", "gruppe", "dozent",
+    "tag", "zeit", "rhythmus", "raum", "sws",
+    "max_teilnehmer", "belegung", "semester", "studiengaenge",
+)
+EXPORT_FROM_DICT = itemgetter(*EXPORT_FIELDS)  # aus der DB geladene Dicts
+EXPORT_FROM_OBJ = attrgetter(*EXPORT_FIELDS)  # Veranstaltung-Objekte direkt vom Scraper
+
+# Gebäude = alles vor der ersten Ziffer im Raumnamen ("HZ 1" -> "HZ")
+GEBAEUDE_RE = re.compile(r"^(.+?)\s*\d")
 
 
+@app.before_request
+def normalize_if_none_match():
+    """Entfernt das Kompressions-Suffix aus If-None-Match, damit 304 greift."""
+    inm = request.environ.get("HTTP_IF_NONE_MATCH")
+    if inm:
+        request.environ["HTTP_IF_NONE_MATCH"] = COMPRESSED_ETAG_RE.sub('"', inm)
+
+
+@app.before_request
 def check_auth():
-    key = request.headers.get("X-API-Key") or request.args.get("key")
-    if key != API_KEY:
+    """Prüft den API-Key einmal pro Request und legt den User in g.user ab."""
+    # CORS-Preflights und unbekannte Routen (-> 404) nicht blockieren
+    if request.method == "OPTIONS" or request.endpoint is None or request.endpoint in PUBLIC_ENDPOINTS:
+        return None
+    key = request.headers.get("X-API-Key") or request.args.get("key") or ""
+    if not hmac.compare_digest(key.encode(), API_KEY.encode()):
         return jsonify({"error": "Unauthorized"}), 401
+    g.user = get_user()
     return None
 
 
@@ -52,15 +133,181 @@ def get_user():
     return request.headers.get("X-User") or request.args.get("user") or "default"
 
 
+class UserCache:
+    """Tree und Veranstaltungen eines Users, jeweils mit JSON-Bytes und ETag."""
+
+    __slots__ = ("tree", "tree_bytes", "tree_etag", "ver_rows", "ver_bytes", "ver_etag")
+
+    def __init__(self):
+        self.tree = None
+        self.tree_bytes = None
+        self.tree_etag = None
+        self.ver_rows = None  # Tupel in Spaltenreihenfolge von EXPORT_HEADERS
+        self.ver_bytes = None
+        self.ver_etag = None
+
+
 def get_user_cache(user):
     if user not in user_caches:
-        user_caches[user] = {"tree": None, "veranstaltungen": None}
+        user_caches[user] = UserCache()
     return user_caches[user]
 
 
-def user_file(user, name):
-    """Gibt Dateipfad für user-spezifische Datei zurück."""
-    return os.path.join(DATA_DIR, f"{name}_{user}.json")
+def db_connect():
+    return sqlite3.connect(DB_PATH, timeout=30)
+
+
+def init_db():
+    with closing(db_connect()) as conn, conn:
+        # WAL: Leser blockieren nicht, während ein Job schreibt
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "user TEXT, kind TEXT, payload BLOB, etag TEXT, PRIMARY KEY (user, kind))"
+        )
+
+
+def store_payload(user, kind, body, etag):
+    with closing(db_connect()) as conn, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (user, kind, payload, etag) VALUES (?, ?, ?, ?)",
+            (user, kind, body, etag)
+        )
+
+
+def load_payload(user, kind):
+    """Gibt (payload, etag) zurück oder None, wenn nichts gespeichert ist."""
+    with closing(db_connect()) as conn:
+        return conn.execute(
+            "SELECT payload, etag FROM cache WHERE user = ? AND kind = ?", (user, kind)
+        ).fetchone()
+
+
+def json_response(body, etag=None):
+    """Liefert bereits serialisierte JSON-Bytes ohne erneutes Encoding aus.
+
+    Mit ETag antwortet der Endpoint auf If-None-Match mit 304 ohne Body.
+    """
+    response = Response(body, mimetype="application/json")
+    if etag:
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        response.make_conditional(request)
+    return response
+
+
+def etag_for(body):
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def share_strings(rows):
+    """Gleiche Werte (Pfad, Semester, Rhythmus, Dozent, ...) nur einmal im Speicher halten."""
+    pool = {}
+    intern = pool.setdefault
+    return [tuple([intern(v, v) for v in row]) for row in rows]
+
+
+def iter_export_rows(ver_data, fields=EXPORT_FROM_DICT):
+    """Projiziert Veranstaltungen auf die Export-Spalten.
+
+    Gemeinsame Grundlage für Excel- und CSV-Export (Reihenfolge wie EXPORT_HEADERS).
+    """
+    for v in ver_data:
+        row = fields(v)
+        raum = row[9]
+        # Gebäude aus Raum extrahieren
+        geb_match = GEBAEUDE_RE.match(raum)
+        gebaeude = geb_match.group(1).rstrip(" -") if geb_match else raum.split(" - ", 1)[0]
+        yield row[:9] + (gebaeude,) + row[9:]
+
+
+def veranstaltungen_bytes(ver_data):
+    # orjson serialisiert die Veranstaltung-Dataclasses direkt, ohne asdict-Kopie
+    return orjson.dumps({"data": ver_data, "count": len(ver_data)})
+
+
+init_db()
+
+
+class ScanGroup:
+    """Scannt mehrere Roots parallel, je ein QISScraper pro Root.
+
+    Stellt wie QISScraper ein ``progress``-Dict bereit, damit /api/progress
+    den zusammengefassten Stand aller Teil-Scans anzeigen kann.
+    """
+
+    def __init__(self, roots, force_refresh=False):
+        self.roots = roots
+        self.scrapers = [QISScraper(force_refresh) for _ in roots]
+        self.final_progress = None
+
+    def scan_tree(self):
+        workers = min(SCAN_WORKERS, len(self.roots))
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            partials = list(ex.map(
+                lambda pair: pair[0].scan_tree(start_root=pair[1]),
+                zip(self.scrapers, self.roots)
+            ))
+        tree = [node for partial in partials for node in partial]
+
+        count = 0
+        stack = list(tree)
+        while stack:
+            count += 1
+            stack.extend(stack.pop().children)
+        progress = self.progress
+        progress["phase"] = "scan_done" if tree else "error"
+        progress["status"] = f"Struktur geladen: {count} Bereiche"
+        self.final_progress = progress
+        return tree
+
+    @property
+    def progress(self):
+        if self.final_progress:
+            return self.final_progress
+        parts = [s.progress for s in self.scrapers]
+        done = sum(1 for p in parts if p["phase"] in ("scan_done", "error"))
+        return {
+            "phase": "scan",
+            "status": f"Scanne Studiengänge ({done}/{len(parts)} fertig)...",
+            "current": sum(p["current"] for p in parts),
+            "total": 0,
+            "details": [d for p in parts for d in list(p["details"])][-5:],
+        }
+
+
+def submit_job(fn):
+    """Startet einen Scan/Scrape-Job; /api/progress fragt den Future ab."""
+    future = JOB_EXECUTOR.submit(fn)
+    future.add_done_callback(log_job_error)
+    app.config["current_job"] = future
+    return future
+
+
+def log_job_error(future):
+    error = future.exception()
+    if error is not None:
+        app.logger.error("Job fehlgeschlagen", exc_info=error)
+
+
+def write_excel(path, rows):
+    """Schreibt die Export-Zeilen (siehe get_export_rows/iter_export_rows) als Stundenplan nach ``path``."""
+    # constant_memory: Zeilen werden direkt geschrieben statt im Speicher gehalten
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    ws = workbook.add_worksheet("Stundenplan")
+    header_fmt = workbook.add_format(HEADER_FORMAT)
+    body_fmt = workbook.add_format(BODY_FORMAT)
+
+    for i, w in enumerate(EXPORT_WIDTHS):
+        ws.set_column(i, i, w)
+
+    ws.write_row(0, 0, EXPORT_HEADERS, header_fmt)
+    for row_idx, values in enumerate(rows, 1):
+        ws.write_row(row_idx, 0, values, body_fmt)
+
+    ws.autofilter(0, 0, len(rows), len(EXPORT_HEADERS) - 1)
+
+    workbook.close()
 
 
 @app.route("/")
@@ -87,244 +334,227 @@ def api_login():
 
 @app.route("/api/lehramtstypen")
 def api_lehramtstypen():
-    auth_error = check_auth()
-    if auth_error:
-        return auth_error
+    if cached_lehramtstypen:
+        return json_response(cached_lehramtstypen)
+    return json_response(load_lehramtstypen())
+
+
+def load_lehramtstypen():
+    """Lädt die Lehramtstypen aus Datei oder per Scrape und cached die Bytes.
 
+    Der Lock verhindert, dass gleichzeitige erste Anfragen mehrfach scrapen.
+    Leere Ergebnisse werden nicht gecached, damit ein Fehler nicht hängen bleibt.
+    """
     global cached_lehramtstypen
 
-    lt_file = os.path.join(DATA_DIR, "lehramtstypen.json")
-    if cached_lehramtstypen:
-        return jsonify(cached_lehramtstypen)
-    elif os.path.exists(lt_file):
-        with open(lt_file, "r", encoding="utf-8") as f:
-            cached_lehramtstypen = json.load(f)
-            return jsonify(cached_lehramtstypen)
+    with lehramtstypen_lock:
+        if cached_lehramtstypen:
+            return cached_lehramtstypen
+
+        row = load_payload("", "lehramtstypen")
+        if row:
+            cached_lehramtstypen = row[0]
+            return cached_lehramtstypen
 
-    scraper = QISScraper()
-    typen = scraper.scan_top_level()
-    if typen:
-        cached_lehramtstypen = typen
-        with open(lt_file, "w", encoding="utf-8") as f:
-            json.dump(typen, f, ensure_ascii=False, indent=2)
-    return jsonify(typen)
+        scraper = QISScraper()
+        typen = scraper.scan_top_level()
+        body = orjson.dumps(typen)
+        if typen:
+            cached_lehramtstypen = body
+            store_payload("", "lehramtstypen", body, etag_for(body))
+        return body
 
 
 @app.route("/api/scan-tree", methods=["POST"])
 def api_scan_tree():
-    auth_error = check_auth()
-    if auth_error:
-        return auth_error
-
-    user = get_user()
+    user = g.user
 
     if scraper_lock.locked():
         return jsonify({"error": "Scraping läuft bereits. Bitte warte bis der aktuelle Scan fertig ist."}), 409
 
-    start_roots = None
-    if request.json:
-        # Mehrere Studiengänge oder einzelner
-        start_roots = request.json.get("root_paths")
-        if not start_roots:
-            single = request.json.get("root_path")
-            if single:
-                start_roots = [single]
+    # Body einmal parsen (orjson über app.json), nicht pro Zugriff
+    data = request.get_json(silent=True, cache=False) or {}
+    # Mehrere Studiengänge oder einzelner
+    start_roots = data.get("root_paths")
+    if not start_roots:
+        single = data.get("root_path")
+        if single:
+            start_roots = [single]
+    # "refresh": QIS-Seiten neu laden statt aus dem HTML-Cache
+    refresh = bool(data.get("refresh"))
 
     def do_scan():
         cache = get_user_cache(user)
         with scraper_lock:
-            scraper = QISScraper()
-            app.config["current_scraper"] = scraper
-            if start_roots and len(start_roots) > 0:
-                # Mehrere Roots nacheinander scannen, Ergebnisse zusammenführen
-                all_trees = []
-                for root in start_roots:
-                    partial = scraper.scan_tree(start_root=root)
-                    all_trees.extend(partial)
-                tree = all_trees
+            if start_roots and len(start_roots) > 1:
+                # Mehrere Roots parallel scannen, Ergebnisse zusammenführen
+                group = ScanGroup(start_roots, refresh)
+                app.config["current_scraper"] = group
+                tree = group.scan_tree()
             else:
-                tree = scraper.scan_tree()
-            cache["tree"] = tree
+                scraper = QISScraper(refresh)
+                app.config["current_scraper"] = scraper
+                tree = scraper.scan_tree(start_root=start_roots[0] if start_roots else None)
+            cache.tree = tree
             tree_data = tree_to_dict(tree)
-            with open(user_file(user, "tree"), "w", encoding="utf-8") as f:
-                json.dump(tree_data, f, ensure_ascii=False, indent=2)
+            cache.tree_bytes = orjson.dumps(tree_data)
+            cache.tree_etag = etag_for(cache.tree_bytes)
+            store_payload(user, "tree", cache.tree_bytes, cache.tree_etag)
             # Don't pop scraper - let polling read final "scan_done" state
 
-    thread = threading.Thread(target=do_scan)
-    thread.start()
+    submit_job(do_scan)
     return jsonify({"status": "started"})
 
 
 @app.route("/api/tree")
 def api_get_tree():
-    auth_error = check_auth()
-    if auth_error:
-        return auth_error
-
-    user = get_user()
+    user = g.user
     cache = get_user_cache(user)
 
-    tf = user_file(user, "tree")
-    if cache["tree"]:
-        return jsonify(tree_to_dict(cache["tree"]))
-    elif os.path.exists(tf):
-        with open(tf, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            cache["tree"] = dict_to_tree(data)
-            return jsonify(data)
-    return jsonify(None)
+    if not cache.tree_bytes:
+        # Gespeicherte Bytes unverändert übernehmen; als Objektbaum
+        # geparst wird erst von /api/scrape
+        row = load_payload(user, "tree")
+        if not row:
+            return jsonify(None)
+        cache.tree_bytes, cache.tree_etag = row
+    return json_response(cache.tree_bytes, cache.tree_etag)
 
 
 @app.route("/api/scrape", methods=["POST"])
 def api_scrape():
-    auth_error = check_auth()
-    if auth_error:
-        return auth_error
-
-    user = get_user()
+    user = g.user
     cache = get_user_cache(user)
 
     if scraper_lock.locked():
         return jsonify({"error": "Scraping läuft bereits. Bitte warte bis der aktuelle Vorgang fertig ist."}), 409
 
-    selected = request.json.get("selected", [])
+    data = request.get_json(silent=True, cache=False) or {}
+    selected = frozenset(data.get("selected", ()))
+    refresh = bool(data.get("refresh"))
     if not selected:
         return jsonify({"error": "Keine Bereiche ausgewählt"}), 400
 
-    if not cache["tree"]:
-        tf = user_file(user, "tree")
-        if os.path.exists(tf):
-            with open(tf, "r", encoding="utf-8") as f:
-                cache["tree"] = dict_to_tree(json.load(f))
+    if not cache.tree:
+        row = load_payload(user, "tree")
+        if row:
+            cache.tree = dict_to_tree(orjson.loads(row[0]))
         else:
             return jsonify({"error": "Bitte zuerst Struktur laden"}), 400
 
     def do_scrape():
         with scraper_lock:
-            scraper = QISScraper()
+            scraper = QISScraper(refresh)
             app.config["current_scraper"] = scraper
-            veranstaltungen = scraper.scrape_selected(cache["tree"], set(selected))
-            from dataclasses import asdict
-            ver_data = [asdict(v) for v in veranstaltungen]
-            cache["veranstaltungen"] = ver_data
-            with open(user_file(user, "veranstaltungen"), "w", encoding="utf-8") as f:
-                json.dump(ver_data, f, ensure_ascii=False, indent=2)
+            veranstaltungen = scraper.scrape_selected(cache.tree, selected)
+            cache.ver_rows = share_strings(iter_export_rows(veranstaltungen, EXPORT_FROM_OBJ))
+            cache.ver_bytes = veranstaltungen_bytes(veranstaltungen)
+            cache.ver_etag = etag_for(cache.ver_bytes)
+            store_payload(user, "veranstaltungen", cache.ver_bytes, cache.ver_etag)
             # Don't pop scraper - let polling read final "done" state
 
-    thread = threading.Thread(target=do_scrape)
-    thread.start()
+    submit_job(do_scrape)
     return jsonify({"status": "started"})
 
 
 @app.route("/api/progress")
 def api_progress():
-    auth_error = check_auth()
-    if auth_error:
-        return auth_error
-
     scraper = app.config.get("current_scraper")
+    job = app.config.get("current_job")
     if scraper:
-        return jsonify(scraper.progress)
+        progress = scraper.progress
+        # details ist im Scraper eine deque(maxlen=5)
+        progress = {**progress, "details": list(progress["details"])}
+        # Abgestürzter Job: sonst bliebe die Phase für immer auf "scan"/"scrape"
+        if job is not None and job.done() and job.exception() is not None:
+            progress = {**progress, "phase": "error", "status": f"Fehler: {job.exception()}"}
+        return jsonify(progress)
     return jsonify({"phase": "idle", "status": "Bereit", "current": 0, "total": 0, "details": []})
 
 
 @app.route("/api/veranstaltungen")
 def api_veranstaltungen():
-    auth_error = check_auth()
-    if auth_error:
-        return auth_error
-
-    user = get_user()
+    user = g.user
     cache = get_user_cache(user)
 
-    vf = user_file(user, "veranstaltungen")
-    if cache["veranstaltungen"]:
-        return jsonify({"data": cache["veranstaltungen"], "count": len(cache["veranstaltungen"])})
-    elif os.path.exists(vf):
-        with open(vf, "r", encoding="utf-8") as f:
-            cache["veranstaltungen"] = json.load(f)
-            return jsonify({"data": cache["veranstaltungen"], "count": len(cache["veranstaltungen"])})
-    return jsonify({"data": None, "count": 0})
+    if not cache.ver_bytes:
+        row = load_payload(user, "veranstaltungen")
+        if not row:
+            return jsonify({"data": None, "count": 0})
+        cache.ver_bytes, cache.ver_etag = row
+    return json_response(cache.ver_bytes, cache.ver_etag)
 
 
-@app.route("/api/download-excel")
-def api_download_excel():
-    auth_error = check_auth()
-    if auth_error:
-        return auth_error
-
-    user = get_user()
+def get_export_rows(user):
+    """Export-Zeilen des Users aus dem Cache bzw. der Datenbank (oder None)."""
     cache = get_user_cache(user)
+    if not cache.ver_rows:
+        row = load_payload(user, "veranstaltungen")
+        if row:
+            cache.ver_rows = share_strings(iter_export_rows(orjson.loads(row[0])["data"]))
+    return cache.ver_rows
 
-    if not cache["veranstaltungen"]:
-        vf = user_file(user, "veranstaltungen")
-        if os.path.exists(vf):
-            with open(vf, "r", encoding="utf-8") as f:
-                cache["veranstaltungen"] = json.load(f)
 
-    if not cache["veranstaltungen"]:
+@app.route("/api/download-excel")
+def api_download_excel():
+    user = g.user
+    rows = get_export_rows(user)
+    if not rows:
         return jsonify({"error": "Keine Daten vorhanden"}), 404
 
-    ver_data = cache["veranstaltungen"]
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Stundenplan"
-
-    header_font = Font(bold=True, color="FFFFFF", size=11)
-    header_fill = PatternFill(start_color="D4467E", end_color="D4467E", fill_type="solid")
-    header_align = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    thin_border = Border(
-        left=Side(style="thin"), right=Side(style="thin"),
-        top=Side(style="thin"), bottom=Side(style="thin")
-    )
-
-    headers = [
-        "Titel", "Bereich", "Modul", "Art", "Gruppe", "Dozent",
-        "Tag", "Zeit", "Rhythmus", "Gebäude", "Raum", "SWS",
-        "Max. TN", "Belegung", "Semester", "Studiengänge"
-    ]
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_align
-        cell.border = thin_border
-
-    for row_idx, v in enumerate(ver_data, 2):
-        raum = v.get("raum", "")
-        # Gebäude aus Raum extrahieren
-        geb_match = re.match(r'^(.+?)\s*\d', raum)
-        gebaeude = geb_match.group(1).rstrip(" -") if geb_match else raum.split(" - ")[0] if raum else ""
-
-        values = [
-            v.get("titel", ""), v.get("pfad", ""), v.get("kennung", ""),
-            v.get("veranstaltungsart", ""), v.get("gruppe", ""), v.get("dozent", ""),
-            v.get("tag", ""), v.get("zeit", ""), v.get("rhythmus", ""),
-            gebaeude, raum, v.get("sws", ""), v.get("max_teilnehmer", ""),
-            v.get("belegung", ""), v.get("semester", ""), v.get("studiengaenge", ""),
-        ]
-        for col, val in enumerate(values, 1):
-            cell = ws.cell(row=row_idx, column=col, value=val)
-            cell.border = thin_border
-            cell.alignment = Alignment(vertical="center", wrap_text=True)
-
-    widths = [40, 30, 12, 20, 12, 25, 6, 16, 8, 25, 30, 5, 8, 12, 12, 40]
-    for i, w in enumerate(widths):
-        col_letter = chr(65 + i)
-        ws.column_dimensions[col_letter].width = w
-
-    ws.auto_filter.ref = f"A1:P{len(ver_data) + 1}"
-
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
+    # Workbook auf Platte schreiben und von dort streamen statt über BytesIO;
+    # der offene Handle hält die Datei bis zum Ende der Antwort am Leben
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        write_excel(path, rows)
+        output = open(path, "rb")
+    finally:
+        os.unlink(path)
 
     filename = f"KursKompass_{user}_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
     return send_file(output, as_attachment=True, download_name=filename,
                      mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
 
+@app.route("/api/download-csv")
+def api_download_csv():
+    user = g.user
+    rows = get_export_rows(user)
+    if not rows:
+        return jsonify({"error": "Keine Daten vorhanden"}), 404
+
+    def generate():
+        # BOM + Semikolon, damit Excel (de) die Datei direkt richtig öffnet
+        buf = StringIO()
+        writer = csv.writer(buf, delimiter=";")
+        buf.write("\ufeff")
+        writer.writerow(EXPORT_HEADERS)
+        for start in range(0, len(rows), 500):
+            writer.writerows(rows[start:start + 500])
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+
+    filename = f"KursKompass_{user}_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
+    response = Response(generate(), mimetype="text/csv")
+    set_attachment_name(response, filename)
+    return response
+
+
+def set_attachment_name(response, filename):
+    """Content-Disposition wie bei send_file: quotiert, Nicht-ASCII zusätzlich als filename* (RFC 5987)."""
+    try:
+        filename.encode("ascii")
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize("NFKD", filename).encode("ascii", "ignore").decode("ascii")
+        quoted = quote(filename, safe="!#$&+-.^_`|~")
+        names = {"filename": simple, "filename*": f"UTF-8''{quoted}"}
+    else:
+        names = {"filename": filename}
+    response.headers.set("Content-Disposition", "attachment", **names)
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port, debug=False)
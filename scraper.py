@@ -3,25 +3,319 @@ KursKompass API – QIS/LSF Scraper für Goethe-Universität Frankfurt
 Backend-API für das statische Frontend.
 """
 
+import os
+import gzip
+import zlib
+import hashlib
+import tempfile
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+from urllib3.util.retry import Retry
+import lxml.html
+from lxml import etree
 import time
 import re
-import json
 import logging
-from dataclasses import dataclass, field, asdict
-from typing import Optional
-from urllib.parse import urljoin, unquote
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import islice
+from urllib.parse import urljoin, unquote, urlsplit
+from urllib.robotparser import RobotFileParser
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://qis.server.uni-frankfurt.de"
 START_ROOT = "118146%7C118447"
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
 REQUEST_DELAY = 1.2
+# Parallele Requests (Seiten bzw. Detailseiten); der Abstand zwischen Request-Starts
+# bleibt REQUEST_DELAY, mehr Worker überbrücken nur längere Antwortzeiten
+FETCH_WORKERS = int(os.environ.get("FETCH_WORKERS", "4"))
+DETAIL_WORKERS = int(os.environ.get("DETAIL_WORKERS", "4"))
+MAX_RETRIES = 3  # Wiederholungen bei 429/503
+ROBOTS_RETRY = 60  # Sekunden, die eine nicht erreichbare robots.txt als "alles verboten" gilt
+MAX_RETRY_AFTER = 60  # längeres Retry-After: URL aufgeben statt den Job (und scraper_lock) zu blockieren
+MAX_DEPTH = 6  # Ebenen unterhalb der Top-Level-Bereiche, die gescannt werden
+POOL_SIZE = max(16, FETCH_WORKERS + DETAIL_WORKERS)  # Keep-Alive-Verbindungen pro Session
+DETAIL_CACHE_SIZE = 4096  # gemerkte Detailseiten pro Scraper (mehrfach verlinkte Veranstaltungen)
+
+# Festplatten-Cache für geladenes HTML (0 = aus)
+HTML_CACHE_DIR = os.environ.get(
+    "HTML_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "html_cache"),
+)
+HTML_CACHE_TTL = int(os.environ.get("HTML_CACHE_TTL", "3600"))
+
+HTML_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+PARSE_CHUNK = 16384  # Bytes pro feed() beim Teil-Parsen von Veranstaltungslisten
+
+VER_SUMMARY = "Übersicht über alle Veranstaltungen"
+VER_TABLE = f'.//table[@summary="{VER_SUMMARY}"]'
+# ASCII-Teil des summary als Byte-Vorfilter (unabhängig von Umlaut-Kodierung/Entities)
+VER_MARKER = b"alle Veranstaltungen"
+
+GRUPPE_HDR_RE = re.compile(r"Termine\s+Gruppe.*Gruppe\s*\d+")
+GRUPPE_N_RE = re.compile(r"Gruppe\s*(\d+)")
+# Wochentage mit und ohne Punkt (entspricht ^(Mo|Di|...)\.?$)
+WOCHENTAGE = frozenset(t + p for t in ("Mo", "Di", "Mi", "Do", "Fr", "Sa", "So") for p in ("", "."))
+
+# Aus den Detaildaten übernommene Felder, pro Veranstaltung bzw. pro Termin/Gruppe
+DETAIL_KEYS = ("semester", "sws", "max_teilnehmer", "belegung", "belegungsfristen", "credits",
+               "sprache", "kuerzel", "studiengaenge", "kommentar", "voraussetzungen")
+TERMIN_KEYS = ("tag", "zeit", "rhythmus", "raum")
+
+# Label (Teilstring, erster Treffer gewinnt) -> Ergebnisfeld in _scrape_detail
+GRUND_FELDER = {
+    "Veranstaltungsart": "veranstaltungsart",
+    "Kürzel": "kuerzel",
+    "Semester": "semester",
+    "Max. Teilnehmer": "max_teilnehmer",
+    "Sprache": "sprache",
+    "Credits": "credits",
+}
+GRUND_EXAKT = {"SWS": "sws", "Belegung": "belegung"}
+INHALT_FELDER = {"Kommentar": "kommentar", "Voraussetzungen": "voraussetzungen"}
+
+
+def _find_course_table(content):
+    """Parst content nur bis zum Ende der Veranstaltungstabelle; None, wenn keine gefunden."""
+    parser = etree.HTMLPullParser(events=("end",), tag="table", encoding="utf-8")
+    for start in range(0, len(content), PARSE_CHUNK):
+        parser.feed(content[start:start + PARSE_CHUNK])
+        for _, table in parser.read_events():
+            if table.get("summary") == VER_SUMMARY:
+                return table
+    # Erst close() schließt bis zum Dokumentende offen gebliebene Tabellen
+    parser.close()
+    for _, table in parser.read_events():
+        if table.get("summary") == VER_SUMMARY:
+            return table
+    return None
+
+
+def _has_class(name):
+    """XPath-Prädikat: Element trägt die CSS-Klasse name."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# Texte der Ansichts-Umschalter, die wie Baum-Links aussehen
+ANSICHT_LINKS = frozenset({"kurz", "mittel", "lang"})
+
+# Vorkompilierte XPath-Ausdrücke; Element.xpath() übersetzt den Ausdruck bei jedem Aufruf neu
+REGULAR_LINKS = etree.XPath(f".//a[{_has_class('regular')}]")
+KLEIN_LINKS = etree.XPath(f".//a[{_has_class('klein')}]")
+FRIST_CELLS = etree.XPath(".//td[contains(concat(' ', normalize-space(@headers), ' '), ' basic_14 ')]")
+ALL_TEXT = etree.XPath("//text()")
+GRUPPE_HEADINGS = etree.XPath('//h2[contains(., "Gruppe")] | //h3[contains(., "Gruppe")]')
+RAUM_TITLE_LINKS = etree.XPath('.//a[contains(@title, "Details ansehen zu Raum")]')
+RAUM_HREF_LINKS = etree.XPath('.//a[contains(@href, "raum")]')
+# Nur Baum-Links; andere a.ueb werden schon in libxml2 verworfen
+TREE_LINKS = etree.XPath(
+    f"//a[{_has_class('ueb')}][contains(@href, 'state=wtree') and contains(@href, 'root120261=')]"
+)
+
+
+# Geschützte Leerzeichen -> Leerzeichen, weiche Trennstriche und Nullbreiten-Leerzeichen entfernen
+CLEAN_TABLE = str.maketrans({"\xa0": " ", "\u00ad": None, "\u200b": None})
+
+
+def _text(el, sep=""):
+    """Bereinigter Text eines Elements, Teilstücke gestrippt (wie get_text(sep, strip=True))."""
+    return sep.join(t for t in (s.translate(CLEAN_TABLE).strip() for s in el.itertext()) if t)
+
+
+def _tables_by_summary(doc):
+    """summary -> erste Tabelle mit diesem summary, in einem Durchlauf über das Dokument."""
+    tables = {}
+    for table in doc.iter("table"):
+        summary = table.get("summary")
+        if summary and summary not in tables:
+            tables[summary] = table
+    return tables
+
+
+def _data_rows(table):
+    """Alle Zeilen einer Tabelle ohne die Kopfzeile, ohne Zwischenliste."""
+    return islice(table.iter("tr"), 1, None)
+
+
+def _label_value_pairs(table, th_class=None):
+    """(Label, Wert) je th und folgendem td derselben Zeile, in einem Durchlauf."""
+    pairs = []
+    for tr in table.iter("tr"):
+        label = None
+        for cell in tr:
+            if cell.tag == "th":
+                if th_class is None or th_class in cell.get("class", "").split():
+                    label = _text(cell)
+            elif cell.tag == "td" and label is not None:
+                pairs.append((label, _text(cell)))
+                label = None
+    return pairs
+
+
+def _match_label(label, felder):
+    return next((key for part, key in felder.items() if part in label), None)
+
+
+# Die Labels wiederholen sich auf jeder Detailseite; die Zuordnung wird je Label einmal bestimmt
+@lru_cache(maxsize=256)
+def _grund_key(label):
+    return GRUND_EXAKT.get(label) or _match_label(label, GRUND_FELDER)
+
+
+@lru_cache(maxsize=256)
+def _inhalt_key(label):
+    return _match_label(label, INHALT_FELDER)
+
+
+@lru_cache(maxsize=4096)
+def _tree_url(root_path):
+    return (
+        f"{BASE_URL}/qisserver/rds"
+        f"?state=wtree&search=1&trex=step"
+        f"&root120261={root_path}&P.vx=kurz"
+    )
+
+
+def _root_depth(root_path):
+    """Anzahl Segmente eines root_path, ohne ihn zu dekodieren ("|" roh oder als %7C)."""
+    return root_path.count("|") + root_path.count("%7C") + root_path.count("%7c") + 1
+
+
+@lru_cache(maxsize=4096)
+def _decode_root(root_path):
+    """Dekodierter root_path und Anzahl seiner Segmente."""
+    decoded = unquote(root_path)
+    return decoded, decoded.count("|") + 1
 
 
-@dataclass
+# Nächster erlaubter Request-Zeitpunkt pro Host (time.monotonic), über alle Scraper geteilt
+_next_allowed = {}
+_next_allowed_lock = threading.Lock()
+
+# Geparste robots.txt pro Host als (parser, gültig bis); gültig bis None = für den ganzen Prozess
+_robots = {}
+_robots_lock = threading.Lock()
+
+
+# Eine Session für alle Scraper im Prozess, damit Keep-Alive-Verbindungen
+# (und TLS-Sessions) jobübergreifend wiederverwendet werden
+_session = None
+_session_lock = threading.Lock()
+
+
+def _shared_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _new_session()
+        return _session
+
+
+def _new_session():
+    session = requests.Session()
+    session.headers.update({
+        "User-Agent": USER_AGENT,
+        "Accept": "text/html,application/xhtml+xml",
+        "Accept-Language": "de-DE,de;q=0.9",
+        # br nur anbieten, wenn urllib3 es dekodieren kann (Brotli installiert)
+        "Accept-Encoding": make_headers(accept_encoding=True)["accept-encoding"],
+    })
+    # Verbindungsabbrüche und Gateway-Fehler wiederholt urllib3 selbst; Retry-After
+    # ignoriert urllib3, sonst würde es 429/503 ungedrosselt und ungedeckelt wiederholen.
+    # 429/503 behandelt _get_bytes, damit Retry-After für den ganzen Host gilt
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=REQUEST_DELAY,
+        status_forcelist=(502, 504),
+        allowed_methods=frozenset({"GET"}),
+        raise_on_status=False,
+        respect_retry_after_header=False,
+    )
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _throttle(host, delay):
+    """Reserviert den nächsten Slot für host und schläft nur die Restzeit bis dahin."""
+    with _next_allowed_lock:
+        now = time.monotonic()
+        slot = max(now, _next_allowed.get(host, 0.0))
+        _next_allowed[host] = slot + delay
+    if slot > now:
+        time.sleep(slot - now)
+
+
+def _defer_host(host, delay):
+    """Schiebt alle weiteren Requests an host um mindestens delay Sekunden auf."""
+    with _next_allowed_lock:
+        _next_allowed[host] = max(_next_allowed.get(host, 0.0), time.monotonic() + delay)
+
+
+def _cache_path(url):
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(HTML_CACHE_DIR, digest[:2], digest[2:] + ".html.gz")
+
+
+def _cache_read(url):
+    """Liefert gecachtes HTML für url oder None, wenn nicht vorhanden/abgelaufen."""
+    if HTML_CACHE_TTL <= 0:
+        return None
+    path = _cache_path(url)
+    try:
+        if time.time() - os.path.getmtime(path) > HTML_CACHE_TTL:
+            return None
+        with gzip.open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, zlib.error) as e:
+        # Beschädigter Eintrag (z.B. abgeschnitten): verwerfen und neu laden
+        logger.warning(f"HTML-Cache-Eintrag unlesbar, wird verworfen ({path}): {e}")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+
+def _cache_write(url, content):
+    if HTML_CACHE_TTL <= 0:
+        return
+    path = _cache_path(url)
+    tmp = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Eindeutige Temp-Datei, auch über mehrere gunicorn-Worker hinweg
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=5) as f:
+            f.write(content)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"HTML-Cache nicht schreibbar ({path}): {e}")
+        if tmp is not None:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+
+def _retry_after(response, attempt):
+    value = response.headers.get("Retry-After", "")
+    if value.isdigit():
+        return int(value)
+    return REQUEST_DELAY * 2 ** attempt
+
+
+@dataclass(slots=True)
 class Veranstaltung:
     pfad: str = ""
     kennung: str = ""
@@ -45,10 +339,10 @@ class Veranstaltung:
     kommentar: str = ""
     voraussetzungen: str = ""
     detail_url: str = ""
-    weitere_termine: list = field(default_factory=list)
+    weitere_termine: tuple = ()  # leer teilen sich alle Einträge dasselbe ()
 
 
-@dataclass
+@dataclass(slots=True)
 class BaumKnoten:
     name: str
     root_path: str
@@ -59,198 +353,298 @@ class BaumKnoten:
 
 class QISScraper:
 
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
-            "Accept": "text/html,application/xhtml+xml",
-            "Accept-Language": "de-DE,de;q=0.9",
-        })
+    def __init__(self, force_refresh=False):
+        self.session = _shared_session()
+        self.force_refresh = force_refresh  # HTML-Cache nicht lesen, nur neu befüllen
         self.veranstaltungen = []
+        self._node_count = 0
+        self._progress_lock = threading.Lock()
+        self._detail_cache = {}
+        self._detail_lock = threading.Lock()
+        self._detail_pool = None  # nur während scrape_selected
         self.progress = {
             "phase": "idle",
             "status": "Bereit",
             "current": 0,
             "total": 0,
-            "details": []
+            "details": deque(maxlen=5)
         }
 
     def _get_page(self, url):
+        content = self._get_bytes(url)
+        if content is None:
+            return None
+        return self._parse_page(url, content)
+
+    def _parse_page(self, url, content):
         try:
-            time.sleep(REQUEST_DELAY)
+            return lxml.html.document_fromstring(content, parser=HTML_PARSER)
+        except Exception as e:
+            logger.error(f"Fehler beim Parsen von {url}: {e}")
+            return None
+
+    def _robots_for(self, scheme, host):
+        with _robots_lock:
+            robots, expires = _robots.get(host, (None, None))
+            if robots is None or (expires is not None and time.monotonic() >= expires):
+                robots, ok = self._load_robots(f"{scheme}://{host}/robots.txt", host)
+                _robots[host] = (robots, None if ok else time.monotonic() + ROBOTS_RETRY)
+        return robots
+
+    def _load_robots(self, url, host):
+        """Lädt robots.txt als (parser, ok).
+
+        Fehlt sie (4xx), gelten keine Einschränkungen. Bei 5xx oder Netzwerkfehler
+        ist vorerst alles verboten (RFC 9309); ok=False, damit später neu geladen wird.
+        """
+        robots = RobotFileParser(url)
+        try:
+            _throttle(host, REQUEST_DELAY)
             response = self.session.get(url, timeout=30)
+        except requests.RequestException as e:
+            logger.warning(f"robots.txt von {host} nicht ladbar: {e}")
+            response = None
+        if response is not None and response.status_code < 500:
+            robots.parse(response.text.splitlines() if response.status_code < 400 else [])
+            return robots, True
+        if response is not None:
+            logger.warning(f"robots.txt von {host}: HTTP {response.status_code}")
+        robots.disallow_all = True
+        return robots, False
+
+    def _get_bytes(self, url):
+        """Rohes HTML von url, aus dem Cache oder per GET; None bei Fehler oder robots.txt-Verbot."""
+        parts = urlsplit(url)
+        host = parts.netloc
+        try:
+            content = None if self.force_refresh else _cache_read(url)
+            if content is not None:
+                return content
+
+            robots = self._robots_for(parts.scheme, host)
+            if not robots.can_fetch(USER_AGENT, url):
+                logger.info(f"robots.txt verbietet {url}")
+                return None
+            # Crawl-delay aus robots.txt ist Untergrenze für den Abstand
+            base = max(REQUEST_DELAY, robots.crawl_delay(USER_AGENT) or 0)
+
+            for attempt in range(MAX_RETRIES + 1):
+                _throttle(host, base)
+                response = self.session.get(url, timeout=30)
+                if response.status_code not in (429, 503) or attempt == MAX_RETRIES:
+                    break
+                # Retry-After verschiebt nur den nächsten Slot; der Abstand bleibt mindestens base
+                wait_for = _retry_after(response, attempt)
+                if wait_for > MAX_RETRY_AFTER:
+                    logger.warning(f"{response.status_code} von {host}, Retry-After {wait_for}s zu lang, "
+                                   f"überspringe {url}")
+                    _defer_host(host, max(base, MAX_RETRY_AFTER))
+                    return None
+                wait_for = max(base, wait_for)
+                logger.warning(f"{response.status_code} von {host}, warte {wait_for:.1f}s")
+                _defer_host(host, wait_for)
             response.raise_for_status()
-            response.encoding = "utf-8"
-            return BeautifulSoup(response.text, "lxml")
+            _cache_write(url, response.content)
+            return response.content
         except Exception as e:
             logger.error(f"Fehler beim Abrufen von {url}: {e}")
             return None
 
-    def _build_tree_url(self, root_path):
-        return (
-            f"{BASE_URL}/qisserver/rds"
-            f"?state=wtree&search=1&trex=step"
-            f"&root120261={root_path}&P.vx=kurz"
-        )
-
     # === TOP-LEVEL: Quick scan for Lehramtstypen ===
 
     def scan_top_level(self):
         """Scannt nur die erste Ebene (L1, L2, L3, L5 etc.)."""
-        url = self._build_tree_url(START_ROOT)
-        soup = self._get_page(url)
-        if not soup:
+        url = _tree_url(START_ROOT)
+        doc = self._get_page(url)
+        if doc is None:
             return []
-        nodes = self._find_tree_children(soup, START_ROOT)
+        nodes = self._find_tree_children(doc, START_ROOT)
         return [{"name": n.name, "root_path": n.root_path} for n in nodes]
 
     # === PHASE 1: Tree Scan ===
 
     def scan_tree(self, start_root=None):
-        self.progress = {"phase": "scan", "status": "Scanne Baumstruktur...", "current": 0, "total": 0, "details": []}
+        self.progress = {"phase": "scan", "status": "Scanne Baumstruktur...", "current": 0, "total": 0, "details": deque(maxlen=5)}
 
         root = start_root or START_ROOT
-        url = self._build_tree_url(root)
-        soup = self._get_page(url)
-        if not soup:
+        url = _tree_url(root)
+        doc = self._get_page(url)
+        if doc is None:
             self.progress["status"] = "Fehler beim Laden der Startseite"
             self.progress["phase"] = "error"
             return []
 
-        top_nodes = self._find_tree_children(soup, root)
+        top_nodes = self._find_tree_children(doc, root)
 
         # If no children found, this node itself might have courses
         if not top_nodes and start_root:
             # Create a single node for this root
             node = BaumKnoten(name="Ausgewählter Bereich", root_path=root, url=url)
-            ver_table = soup.find("table", summary="Übersicht über alle Veranstaltungen")
-            if ver_table:
+            ver_table = doc.find(VER_TABLE)
+            if ver_table is not None:
                 node.has_veranstaltungen = True
             top_nodes = [node]
 
-        for node in top_nodes:
-            logger.info(f"Scanne: {node.name}")
-            self.progress["status"] = f"Scanne {node.name}..."
-            self._scan_node_recursive(node, 0, 6)
+        self._node_count = len(top_nodes)
+
+        # Alle Ebenen über eine gemeinsame Warteschlange: Jeder fertige Knoten
+        # reiht seine Kinder ein, freie Worker holen sich den nächsten
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+            pending = {pool.submit(self._scan_node, node, 0) for node in top_nodes}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for child, depth in future.result():
+                        pending.add(pool.submit(self._scan_node, child, depth))
 
         self.progress["phase"] = "scan_done"
-        self.progress["status"] = f"Struktur geladen: {self._count_nodes(top_nodes)} Bereiche"
+        self.progress["status"] = f"Struktur geladen: {self._node_count} Bereiche"
         return top_nodes
 
-    def _scan_node_recursive(self, node, depth, max_depth):
-        if depth >= max_depth:
-            return
+    def _push_progress(self, detail):
+        with self._progress_lock:
+            self.progress["current"] += 1
+        self._push_detail(detail)
+
+    def _push_detail(self, text):
+        """Neuer Ticker-Eintrag; die deque(maxlen=5) verwirft alte, direkte Wiederholungen entfallen."""
+        details = self.progress["details"]
+        if not details or details[-1] != text:
+            details.append(text)
+
+    def _scan_node(self, node, depth):
+        """Lädt eine Baumseite und gibt die noch zu scannenden Kinder als (knoten, tiefe) zurück."""
+        if depth == 0:
+            logger.info(f"Scanne: {node.name}")
+            self.progress["status"] = f"Scanne {node.name}..."
 
-        soup = self._get_page(node.url)
-        if not soup:
-            return
+        content = self._get_bytes(node.url)
+        if content is None:
+            return []
+        doc = self._parse_page(node.url, content)
+        if doc is None:
+            return []
 
-        self.progress["current"] += 1
-        self.progress["details"].append(node.name)
-        if len(self.progress["details"]) > 5:
-            self.progress["details"] = self.progress["details"][-5:]
+        self._push_progress(node.name)
 
-        ver_table = soup.find("table", summary="Übersicht über alle Veranstaltungen")
-        if ver_table:
+        # Ohne den Text im HTML kann es die Tabelle nicht geben, die Suche im Baum entfällt
+        if VER_MARKER in content and doc.find(VER_TABLE) is not None:
             node.has_veranstaltungen = True
 
-        children = self._find_tree_children(soup, node.root_path)
+        children = self._find_tree_children(doc, node.root_path)
         node.children = children
+        with self._progress_lock:
+            self._node_count += len(children)
 
-        for child in children:
-            self._scan_node_recursive(child, depth + 1, max_depth)
+        if depth + 1 >= MAX_DEPTH:
+            return []
+        return [(child, depth + 1) for child in children]
 
-    def _find_tree_children(self, soup, parent_root):
+    def _find_tree_children(self, doc, parent_root):
         children = []
-        parent_decoded = unquote(parent_root)
-        parent_segments = parent_decoded.split("|")
-        parent_depth = len(parent_segments)
-
-        for a_tag in soup.find_all("a", class_="ueb"):
-            href = a_tag.get("href", "")
-            if "state=wtree" not in href or "root120261=" not in href:
-                continue
+        parent_decoded, parent_depth = _decode_root(parent_root)
 
-            match = re.search(r'root120261=([^&]+)', href)
-            if not match:
+        for a_tag in TREE_LINKS(doc):
+            root_path = a_tag.get("href").partition("root120261=")[2].split("&", 1)[0]
+            if not root_path or _root_depth(root_path) != parent_depth + 1:
                 continue
 
-            root_path = match.group(1)
-            root_decoded = unquote(root_path)
-            segments = root_decoded.split("|")
-
-            if len(segments) == parent_depth + 1 and root_decoded.startswith(parent_decoded):
-                name = a_tag.get_text(strip=True)
-                if name and name not in ["kurz", "mittel", "lang"]:
+            # Gleiche Kodierung wie der Elternpfad: Präfix roh prüfen, sonst dekodiert
+            if root_path.startswith(parent_root) or _decode_root(root_path)[0].startswith(parent_decoded):
+                name = _text(a_tag)
+                if name and name not in ANSICHT_LINKS:
                     children.append(BaumKnoten(
                         name=name,
                         root_path=root_path,
-                        url=self._build_tree_url(root_path)
+                        url=_tree_url(root_path)
                     ))
 
         return children
 
-    def _count_nodes(self, nodes):
-        count = len(nodes)
-        for node in nodes:
-            count += self._count_nodes(node.children)
-        return count
-
     # === PHASE 2: Scrape Selected ===
 
     def scrape_selected(self, tree, selected_paths):
         self.veranstaltungen = []
-        self.progress = {"phase": "scrape", "status": "Starte...", "current": 0, "total": len(selected_paths), "details": []}
+        self.progress = {"phase": "scrape", "status": "Starte...", "current": 0, "total": len(selected_paths), "details": deque(maxlen=5)}
 
-        for node in tree:
-            self._scrape_node_recursive(node, selected_paths, [])
+        pages = self._collect_selected(tree, selected_paths)
+
+        # Ausgewählte Seiten parallel scrapen, Ergebnisse in Baumreihenfolge;
+        # Detailseiten laufen über einen eigenen Pool
+        self._detail_pool = ThreadPoolExecutor(max_workers=DETAIL_WORKERS)
+        try:
+            with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+                for result in pool.map(self._scrape_selected_page, pages):
+                    self.veranstaltungen.extend(result)
+        finally:
+            self._detail_pool.shutdown()
 
         self.progress["phase"] = "done"
         self.progress["status"] = f"Fertig! {len(self.veranstaltungen)} Veranstaltungen gefunden."
         return self.veranstaltungen
 
-    def _scrape_node_recursive(self, node, selected, path):
-        current_path = path + [node.name]
-
-        if node.root_path in selected:
-            logger.info(f"Scrape: {' > '.join(current_path)}")
-            self.progress["status"] = f"Scrape: {node.name}..."
-            self._scrape_page_veranstaltungen(node.url, current_path)
+    def _collect_selected(self, tree, selected):
+        """Sammelt (node, pfad) aller ausgewählten Knoten in Baumreihenfolge."""
+        out = []
+        stack = [(node, [node.name]) for node in reversed(tree)]
+        while stack:
+            node, path = stack.pop()
+            if node.root_path in selected:
+                out.append((node, path))
+            stack.extend((child, path + [child.name]) for child in reversed(node.children))
+        return out
+
+    def _scrape_selected_page(self, item):
+        node, path = item
+        logger.info(f"Scrape: {' > '.join(path)}")
+        self.progress["status"] = f"Scrape: {node.name}..."
+        result = self._scrape_page_veranstaltungen(node.url, path)
+        with self._progress_lock:
             self.progress["current"] += 1
-
-        for child in node.children:
-            self._scrape_node_recursive(child, selected, current_path)
+        return result
 
     def _scrape_page_veranstaltungen(self, url, path):
-        soup = self._get_page(url)
-        if not soup:
-            return
+        result = []
+        content = self._get_bytes(url)
+        if content is None or VER_MARKER not in content:
+            return result
 
-        table = soup.find("table", summary="Übersicht über alle Veranstaltungen")
-        if not table:
-            return
-
-        rows = table.find_all("tr")
-        for row in rows:
-            cells = row.find_all("td")
+        # Schnellweg: Nur bis zum Ende der Veranstaltungstabelle parsen;
+        # scheitert der Pull-Parser oder findet nichts, das ganze Dokument
+        try:
+            table = _find_course_table(content)
+        except etree.LxmlError:
+            table = None
+        if table is None:
+            try:
+                table = lxml.html.document_fromstring(content, parser=HTML_PARSER).find(VER_TABLE)
+            except Exception as e:
+                logger.error(f"Fehler beim Parsen von {url}: {e}")
+                return result
+        if table is None:
+            return result
+
+        kurse = []
+        for row in table.iter("tr"):
+            cells = list(row.iter("td"))
             if len(cells) < 2:
                 continue
 
             first_cell = cells[0]
-            link = first_cell.find("a", class_="regular")
-            if not link or "state=verpublish" not in link.get("href", ""):
+            link = next(iter(REGULAR_LINKS(first_cell)), None)
+            if link is None or "state=verpublish" not in link.get("href", ""):
                 continue
 
-            link_text = link.get_text(strip=True)
-            detail_url = urljoin(BASE_URL, link["href"])
+            link_text = _text(link)
+            detail_url = urljoin(BASE_URL, link.get("href"))
 
-            dozent_links = first_cell.find_all("a", class_="klein")
+            dozent_links = KLEIN_LINKS(first_cell)
             dozent_parts = []
             for dl in dozent_links:
-                dozent_parts.append(dl.get_text(" ", strip=True))
+                dozent_parts.append(_text(dl, " "))
             dozent = ", ".join(dozent_parts)
 
-            vst_art = cells[1].get_text(strip=True) if len(cells) > 1 else ""
+            vst_art = _text(cells[1]) if len(cells) > 1 else ""
 
             kennung = ""
             titel = link_text
@@ -259,119 +653,100 @@ class QISScraper:
                 kennung = parts[0].strip()
                 titel = parts[1].strip()
 
-            self.progress["details"].append(f"{titel[:50]}...")
-            if len(self.progress["details"]) > 5:
-                self.progress["details"] = self.progress["details"][-5:]
-
-            detail = self._scrape_detail(detail_url)
-
             # Modul-Fix: Wenn kennung leer, aus Pfad den letzten Bereich nehmen
             if not kennung and path:
-                kennung = path[-1] if len(path) > 0 else ""
+                kennung = path[-1]
 
-            base_dozent = dozent or (detail.get("dozent", "") if detail else "")
-            gruppen = detail.get("gruppen", []) if detail else []
+            future = self._detail_pool.submit(self._scrape_detail, detail_url)
+            kurse.append((future, kennung, titel, dozent, vst_art, detail_url))
+
+        # Detailseiten werden parallel geladen, Einträge in Tabellenreihenfolge gebaut
+        for future, kennung, titel, dozent, vst_art, detail_url in kurse:
+            detail = future.result() or {}
+            self._push_detail(f"{titel[:50]}...")
+
+            base_dozent = dozent or detail.get("dozent", "")
+            gruppen = detail.get("gruppen", [])
+            # Felder, die für alle Einträge dieser Veranstaltung gleich sind
+            base = {k: detail.get(k, "") for k in DETAIL_KEYS}
+            base.update(pfad=" > ".join(path), kennung=kennung, titel=titel,
+                        veranstaltungsart=vst_art, detail_url=detail_url)
 
             # Wenn Gruppen vorhanden: Pro Gruppe einen Eintrag
-            if gruppen and len(gruppen) > 1:
+            if len(gruppen) > 1:
                 # Prüfe ob es echte Gruppen sind (verschiedene Gruppennamen)
-                gruppe_namen = set(g.get("gruppe", "") for g in gruppen)
-                has_real_groups = any(g for g in gruppe_namen if g)
+                has_real_groups = any(g.get("gruppe") for g in gruppen)
 
                 if has_real_groups:
                     for g in gruppen:
-                        v = Veranstaltung(
-                            pfad=" > ".join(path),
-                            kennung=kennung,
-                            titel=titel,
+                        result.append(Veranstaltung(
+                            **base,
+                            **{k: g.get(k, "") for k in TERMIN_KEYS},
                             dozent=g.get("dozent", "") or base_dozent,
-                            veranstaltungsart=vst_art,
-                            semester=detail.get("semester", "") if detail else "",
-                            sws=detail.get("sws", "") if detail else "",
                             gruppe=g.get("gruppe", ""),
-                            tag=g.get("tag", ""),
-                            zeit=g.get("zeit", ""),
-                            rhythmus=g.get("rhythmus", ""),
-                            raum=g.get("raum", ""),
-                            max_teilnehmer=detail.get("max_teilnehmer", "") if detail else "",
-                            belegung=detail.get("belegung", "") if detail else "",
-                            belegungsfristen=detail.get("belegungsfristen", "") if detail else "",
-                            credits=detail.get("credits", "") if detail else "",
-                            sprache=detail.get("sprache", "") if detail else "",
-                            kuerzel=detail.get("kuerzel", "") if detail else "",
-                            studiengaenge=detail.get("studiengaenge", "") if detail else "",
-                            kommentar=detail.get("kommentar", "") if detail else "",
-                            voraussetzungen=detail.get("voraussetzungen", "") if detail else "",
-                            detail_url=detail_url,
-                        )
-                        self.veranstaltungen.append(v)
+                        ))
                     continue
 
             # Normaler Eintrag (keine Gruppen oder nur eine Gruppe)
-            v = Veranstaltung(
-                pfad=" > ".join(path),
-                kennung=kennung,
-                titel=titel,
+            result.append(Veranstaltung(
+                **base,
+                **{k: detail.get(k, "") for k in TERMIN_KEYS},
                 dozent=base_dozent,
-                veranstaltungsart=vst_art,
-                semester=detail.get("semester", "") if detail else "",
-                sws=detail.get("sws", "") if detail else "",
                 gruppe=gruppen[0].get("gruppe", "") if gruppen else "",
-                tag=detail.get("tag", "") if detail else "",
-                zeit=detail.get("zeit", "") if detail else "",
-                rhythmus=detail.get("rhythmus", "") if detail else "",
-                raum=detail.get("raum", "") if detail else "",
-                max_teilnehmer=detail.get("max_teilnehmer", "") if detail else "",
-                belegung=detail.get("belegung", "") if detail else "",
-                belegungsfristen=detail.get("belegungsfristen", "") if detail else "",
-                credits=detail.get("credits", "") if detail else "",
-                sprache=detail.get("sprache", "") if detail else "",
-                kuerzel=detail.get("kuerzel", "") if detail else "",
-                studiengaenge=detail.get("studiengaenge", "") if detail else "",
-                kommentar=detail.get("kommentar", "") if detail else "",
-                voraussetzungen=detail.get("voraussetzungen", "") if detail else "",
-                detail_url=detail_url,
-                weitere_termine=gruppen[1:] if len(gruppen) > 1 else [],
-            )
-            self.veranstaltungen.append(v)
+                weitere_termine=tuple(gruppen[1:]),
+            ))
+
+        return result
 
     def _scrape_detail(self, url):
-        soup = self._get_page(url)
-        if not soup:
+        """Detaildaten zu url; dieselbe Veranstaltung unter mehreren Pfaden wird nur einmal geladen.
+
+        Im Cache liegt je URL ein Future, damit gleichzeitige Aufrufe auf den
+        laufenden Abruf warten statt die Seite ein zweites Mal zu laden.
+        """
+        with self._detail_lock:
+            pending = self._detail_cache.get(url)
+            owner = pending is None
+            if owner:
+                if len(self._detail_cache) >= DETAIL_CACHE_SIZE:
+                    # Ältesten Eintrag verwerfen
+                    del self._detail_cache[next(iter(self._detail_cache))]
+                pending = self._detail_cache[url] = Future()
+        if not owner:
+            return pending.result()
+
+        result = None
+        try:
+            result = self._fetch_detail(url)
+        finally:
+            if result is None:
+                # Fehlschläge nicht merken, ein späterer Aufruf versucht es erneut
+                with self._detail_lock:
+                    if self._detail_cache.get(url) is pending:
+                        del self._detail_cache[url]
+            pending.set_result(result)
+        return result
+
+    def _fetch_detail(self, url):
+        doc = self._get_page(url)
+        if doc is None:
             return None
 
         result = {}
+        # Ein Durchlauf über alle Tabellen statt einer Suche je Abschnitt
+        tables = _tables_by_summary(doc)
 
         # GRUNDDATEN
-        grunddaten = soup.find("table", summary="Grunddaten zur Veranstaltung")
-        if grunddaten:
-            for th in grunddaten.find_all("th", class_="mod"):
-                label = th.get_text(strip=True)
-                td = th.find_next_sibling("td")
-                if not td:
-                    continue
-                value = td.get_text(strip=True)
-
-                if "Veranstaltungsart" in label:
-                    result["veranstaltungsart"] = value
-                elif "Kürzel" in label:
-                    result["kuerzel"] = value
-                elif "Semester" in label:
-                    result["semester"] = value
-                elif label == "SWS":
-                    result["sws"] = value
-                elif "Max. Teilnehmer" in label:
-                    result["max_teilnehmer"] = value
-                elif "Sprache" in label:
-                    result["sprache"] = value
-                elif "Credits" in label:
-                    result["credits"] = value
-                elif "Belegung" == label:
-                    result["belegung"] = value
+        grunddaten = tables.get("Grunddaten zur Veranstaltung")
+        if grunddaten is not None:
+            for label, value in _label_value_pairs(grunddaten, "mod"):
+                key = _grund_key(label)
+                if key:
+                    result[key] = value
 
             fristen = []
-            for td in grunddaten.find_all("td", headers="basic_14"):
-                frist_text = td.get_text(strip=True)
+            for td in FRIST_CELLS(grunddaten):
+                frist_text = _text(td)
                 if frist_text:
                     fristen.append(frist_text)
             result["belegungsfristen"] = " | ".join(fristen)
@@ -379,60 +754,67 @@ class QISScraper:
         # TERMINE – mit Gruppen-Erkennung
         gruppen = []
 
-        # Suche nach Gruppen-Überschriften ("Termine Gruppe: Gruppe 1")
-        gruppe_headers = soup.find_all(string=re.compile(r"Termine\s+Gruppe.*Gruppe\s*\d+"))
+        # Suche nach Gruppen-Überschriften ("Termine Gruppe: Gruppe 1"),
+        # gemerkt wird das Element, ab dem die Gruppe gilt
+        gruppe_headers = {}
+        for t in ALL_TEXT(doc):
+            if GRUPPE_HDR_RE.search(t):
+                # Tail-Text gehört zum Elternelement des Vorgängers
+                gruppe_headers[t.getparent().getparent() if t.is_tail else t.getparent()] = t
         if not gruppe_headers:
             # Auch nach Überschriften-Tags suchen
-            for tag in soup.find_all(["h2", "h3", "caption", "b", "strong"]):
-                text = tag.get_text(strip=True)
-                if re.search(r"Gruppe\s*\d+", text) and "Termin" in text:
-                    gruppe_headers.append(tag)
+            for tag in doc.iter("h2", "h3", "caption", "b", "strong"):
+                text = _text(tag)
+                if "Termin" in text and GRUPPE_N_RE.search(text):
+                    # Eine caption gilt für ihre eigene Tabelle
+                    gruppe_headers[tag.getparent() if tag.tag == "caption" else tag] = tag.text_content()
 
         if gruppe_headers:
-            # Gruppen-Modus: Jede Gruppe hat eigene Termine
-            for gh in gruppe_headers:
-                gruppe_name_match = re.search(r"Gruppe\s*(\d+)", str(gh) if isinstance(gh, str) else gh.get_text())
-                gruppe_name = f"Gruppe {gruppe_name_match.group(1)}" if gruppe_name_match else ""
-
-                # Finde die nächste Tabelle nach diesem Header
-                parent = gh.parent if not isinstance(gh, str) else gh.parent
-                next_table = None
-                for sibling in parent.find_all_next():
-                    if sibling.name == "table" and sibling.find("th"):
-                        # Prüfe ob es eine Termine-Tabelle ist (hat Tag/Zeit Spalten)
-                        headers_text = " ".join(th.get_text(strip=True) for th in sibling.find_all("th"))
-                        if "Tag" in headers_text and "Zeit" in headers_text:
-                            next_table = sibling
-                            break
-                    # Stop wenn nächste Gruppe kommt
-                    if sibling.name in ["h2", "h3"] and "Gruppe" in sibling.get_text():
-                        break
-
-                if next_table:
-                    termine = self._parse_termine_table(next_table)
-                    if termine:
-                        # Dozent aus der Gruppen-Tabelle extrahieren
-                        gruppe_dozent = ""
-                        for row in next_table.find_all("tr")[1:]:
-                            cells = row.find_all("td")
-                            for cell in cells:
-                                # Lehrperson-Spalte finden
-                                links = cell.find_all("a")
-                                for link in links:
-                                    href = link.get("href", "")
-                                    if "personal" in href:
-                                        gruppe_dozent = link.get_text(strip=True)
-                                        break
-
-                        for t in termine:
-                            t["gruppe"] = gruppe_name
-                            if gruppe_dozent and not t.get("dozent"):
-                                t["dozent"] = gruppe_dozent
-                        gruppen.extend(termine)
+            # Gruppen-Modus: Ein Durchlauf in Dokumentreihenfolge, die erste Termine-Tabelle
+            # nach einer Überschrift gehört zu dieser Gruppe
+            gruppe_name = None
+            # Textinhalt der Überschriften einmal per XPath prüfen statt je Element text_content()
+            gruppe_headings = set(GRUPPE_HEADINGS(doc))
+            for el in doc.iter("*"):
+                if el in gruppe_headers:
+                    gruppe_name_match = GRUPPE_N_RE.search(gruppe_headers[el])
+                    gruppe_name = f"Gruppe {gruppe_name_match.group(1)}" if gruppe_name_match else ""
+                elif el in gruppe_headings:
+                    # Nächste Gruppe ohne eigene Termine
+                    gruppe_name = None
+
+                if gruppe_name is None or el.tag != "table":
+                    continue
+                # Prüfe ob es eine Termine-Tabelle ist (hat Tag/Zeit Spalten)
+                headers_text = " ".join(_text(th) for th in el.iter("th"))
+                if "Tag" not in headers_text or "Zeit" not in headers_text:
+                    continue
+
+                termine = self._parse_termine_table(el)
+                if termine:
+                    # Dozent aus der Gruppen-Tabelle extrahieren
+                    gruppe_dozent = ""
+                    for row in _data_rows(el):
+                        cells = list(row.iter("td"))
+                        for cell in cells:
+                            # Lehrperson-Spalte finden
+                            links = cell.iter("a")
+                            for link in links:
+                                href = link.get("href", "")
+                                if "personal" in href:
+                                    gruppe_dozent = _text(link)
+                                    break
+
+                    for t in termine:
+                        t["gruppe"] = gruppe_name
+                        if gruppe_dozent and not t.get("dozent"):
+                            t["dozent"] = gruppe_dozent
+                    gruppen.extend(termine)
+                gruppe_name = None
         else:
             # Kein Gruppen-Modus: Normale Termine-Tabelle
-            termine_table = soup.find("table", summary="Übersicht über alle Veranstaltungstermine")
-            if termine_table:
+            termine_table = tables.get("Übersicht über alle Veranstaltungstermine")
+            if termine_table is not None:
                 termine = self._parse_termine_table(termine_table)
                 gruppen.extend(termine)
 
@@ -446,75 +828,68 @@ class QISScraper:
             result["raum"] = gruppen[0].get("raum", "")
 
         # DOZENTEN
-        dozenten_table = soup.find("table", summary="Verantwortliche Dozenten")
-        if not dozenten_table:
-            dozenten_table = soup.find("table", summary="Zugeordnete Personen")
-        if dozenten_table:
+        dozenten_table = tables.get("Verantwortliche Dozenten")
+        if dozenten_table is None:
+            dozenten_table = tables.get("Zugeordnete Personen")
+        if dozenten_table is not None:
             dozenten = []
-            for row in dozenten_table.find_all("tr")[1:]:
-                td = row.find("td")
-                if td:
-                    dozent_text = td.get_text(strip=True)
+            for row in _data_rows(dozenten_table):
+                td = next(row.iter("td"), None)
+                if td is not None:
+                    dozent_text = _text(td)
                     if dozent_text:
                         dozenten.append(dozent_text)
             if dozenten:
                 result["dozent"] = "; ".join(dozenten)
 
         # STUDIENGÄNGE
-        stg_table = soup.find("table", summary="Übersicht über die zugehörigen Studiengänge")
-        if stg_table:
+        stg_table = tables.get("Übersicht über die zugehörigen Studiengänge")
+        if stg_table is not None:
             stg_list = []
-            for row in stg_table.find_all("tr")[1:]:
-                cells = row.find_all("td")
+            for row in _data_rows(stg_table):
+                cells = list(row.iter("td"))
                 if len(cells) >= 2:
-                    abschluss = cells[0].get_text(strip=True)
-                    stg = cells[1].get_text(strip=True)
+                    abschluss = _text(cells[0])
+                    stg = _text(cells[1])
                     stg_list.append(f"{abschluss}: {stg}")
             result["studiengaenge"] = "; ".join(stg_list)
 
         # INHALT
-        inhalt_table = soup.find("table", summary="Weitere Angaben zur Veranstaltung")
-        if inhalt_table:
-            for th in inhalt_table.find_all("th"):
-                label = th.get_text(strip=True)
-                td = th.find_next_sibling("td")
-                if not td:
-                    continue
-                text = td.get_text(strip=True)[:500]
-                if "Kommentar" in label:
-                    result["kommentar"] = text
-                elif "Voraussetzungen" in label:
-                    result["voraussetzungen"] = text
+        inhalt_table = tables.get("Weitere Angaben zur Veranstaltung")
+        if inhalt_table is not None:
+            for label, value in _label_value_pairs(inhalt_table):
+                key = _inhalt_key(label)
+                if key:
+                    result[key] = value[:500]
 
         return result
 
     def _parse_termine_table(self, table):
         """Parst eine Termine-Tabelle und gibt Liste von Terminen zurück."""
         termine = []
-        rows = table.find_all("tr")
-        for row in rows[1:]:
-            cells = row.find_all("td")
+        for row in _data_rows(table):
+            cells = list(row.iter("td"))
             if len(cells) < 3:
                 continue
 
             termin = {}
-            cell_texts = [c.get_text(strip=True) for c in cells]
+            cell_texts = [_text(c) for c in cells]
 
             for i, text in enumerate(cell_texts):
-                if re.match(r'^(Mo|Di|Mi|Do|Fr|Sa|So)\.?$', text):
+                if text in WOCHENTAGE:
                     termin["tag"] = text
                     if i + 1 < len(cell_texts):
-                        termin["zeit"] = cell_texts[i + 1].replace('\xa0', ' ')
+                        termin["zeit"] = cell_texts[i + 1]
                     if i + 2 < len(cell_texts):
                         termin["rhythmus"] = cell_texts[i + 2]
                     break
 
             for cell in cells:
-                raum_link = cell.find("a", title=re.compile(r"Details ansehen zu Raum"))
-                if not raum_link:
-                    raum_link = cell.find("a", href=re.compile(r"raum"))
-                if raum_link:
-                    termin["raum"] = raum_link.get_text(strip=True)
+                raum_link = next(iter(RAUM_TITLE_LINKS(cell)), None)
+                if raum_link is None:
+                    raum_link = next(iter(RAUM_HREF_LINKS(cell)), None)
+                if raum_link is not None:
+                    termin["raum"] = _text(raum_link)
                     break
 
             if termin.get("tag"):
@@ -524,23 +899,37 @@ class QISScraper:
 
 
 def tree_to_dict(nodes):
-    return [{
-        "name": n.name,
-        "root_path": n.root_path,
-        "has_veranstaltungen": n.has_veranstaltungen,
-        "children": tree_to_dict(n.children)
-    } for n in nodes]
+    # Iterativ: jede Ebene wird direkt in die Kinderliste ihres Elternknotens geschrieben
+    result = []
+    stack = [(nodes, result)]
+    while stack:
+        level, target = stack.pop()
+        for n in level:
+            children = []
+            target.append({
+                "name": n.name,
+                "root_path": n.root_path,
+                "has_veranstaltungen": n.has_veranstaltungen,
+                "children": children
+            })
+            if n.children:
+                stack.append((n.children, children))
+    return result
 
 
 def dict_to_tree(data):
     result = []
-    for d in data:
-        node = BaumKnoten(
-            name=d["name"],
-            root_path=d["root_path"],
-            url=f"{BASE_URL}/qisserver/rds?state=wtree&search=1&trex=step&root120261={d['root_path']}&P.vx=kurz",
-            has_veranstaltungen=d.get("has_veranstaltungen", False),
-            children=dict_to_tree(d.get("children", []))
-        )
-        result.append(node)
+    stack = [(data, result)]
+    while stack:
+        level, target = stack.pop()
+        for d in level:
+            node = BaumKnoten(
+                name=d["name"],
+                root_path=d["root_path"],
+                url=_tree_url(d["root_path"]),
+                has_veranstaltungen=d.get("has_veranstaltungen", False),
+            )
+            target.append(node)
+            if d.get("children"):
+                stack.append((d["children"], node.children))
     return result